@@ -1,8 +1,17 @@
 #!/usr/bin/env python3
+import functools
+import heapq
+import itertools
+import logging
+import queue
+import random
+import selectors
 import socket
-import threading
 import time
 import sys
+from array import array
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
 
 # --- Configuration ---
 LISTENING_HOST = '10.0.0.1'
@@ -17,132 +26,548 @@ TIME_MULTIPLIERS = {
     ('MUSIC', 'M'): 1, ('MUSIC', 'V'): 3, ('MUSIC', 'P'): 2,
 }
 BUFFER_SIZE = 2048
+REQUEST_SIZE = 2  # type byte + duration digit; the servers read exactly this much and echo it back as the response
+SENDMSG_MAX_CHUNKS = 1024  # IOV_MAX on Linux: the most buffers a single sendmsg() accepts
+SOCKET_BUFFER_SIZE = 1 << 20  # SO_RCVBUF/SO_SNDBUF for the listening and backend sockets
+CLIENT_KEEPIDLE = 60  # seconds of silence before TCP keepalive probes check that a client is still there
+CLIENT_IDLE_TIMEOUT = 30  # seconds a kept-alive client may wait between requests before it is disconnected
+LISTEN_BACKLOG = 1024  # connections the kernel queues for accept(); bursts beyond it wait for SYN retransmits
+
+# --- Precomputed Lookup Tables ---
+# Servers get integer ids that index the scheduling state lists below. Server types get small integer
+# ids too, and each one gets a 256-entry row indexed by the request's raw type byte, so a multiplier is
+# two list indexes. The servers exit on a request type they do not know, so parse_request() rejects any
+# type byte that KNOWN_REQUEST_TYPES does not flag.
+SERVER_NAMES = list(SERVERS)
+SERVER_TYPE_IDS = {}
+for _server_type, _ in TIME_MULTIPLIERS:
+    SERVER_TYPE_IDS.setdefault(_server_type, len(SERVER_TYPE_IDS))
+for _server_id, _config in enumerate(SERVERS.values()):
+    _config['id'] = _server_id
+    _config['type_id'] = SERVER_TYPE_IDS.setdefault(_config['type'], len(SERVER_TYPE_IDS))
+SERVER_TYPE_OF = array('B', [config['type_id'] for config in SERVERS.values()])  # server id -> type id
+MULTIPLIERS_BY_BYTE = [[1] * 256 for _ in SERVER_TYPE_IDS]
+for (_server_type, _request_type), _multiplier in TIME_MULTIPLIERS.items():
+    MULTIPLIERS_BY_BYTE[SERVER_TYPE_IDS[_server_type]][ord(_request_type)] = _multiplier
+KNOWN_REQUEST_TYPES = bytearray(256)  # type byte -> 1 if it appears in TIME_MULTIPLIERS
+for _, _request_type in TIME_MULTIPLIERS:
+    KNOWN_REQUEST_TYPES[ord(_request_type)] = 1
 
 # --- Global Shared State & Debug Flag ---
+# The servers accept a single connection each, so every server gets one persistent socket that all of
+# its requests are pipelined over. It answers them in order, one REQUEST_SIZE response per request.
 server_sockets = {}
-server_finish_times = {}
+server_buffers = {}  # name -> preallocated memoryview that responses from that server are received into
+server_buffer_fill = {}  # name -> bytes of an incomplete response left at the start of its buffer
+pending_clients = {}  # name -> deque of (client_conn, client_addr), in send order
+outgoing_requests = {}  # name -> requests dispatched during this round of events, sent together afterwards
+# Per-server scheduling state is kept as parallel typed arrays indexed by server id.
+server_finish_times = array('d', [0.0] * len(SERVER_NAMES))
+server_jobs = [deque() for _ in SERVER_NAMES]  # server id -> predicted durations of unanswered requests, in send order
+server_pending_work = array('d', [0.0] * len(SERVER_NAMES))  # running sum of each server's server_jobs
+server_versions = array('q', [-1] * len(SERVER_NAMES))  # version of each live heap entry; -1 once removed
+server_type_heaps = [[] for _ in SERVER_TYPE_IDS]  # type id -> min-heap of (finish_time, version, server id)
 active_servers = SERVERS.copy()
-state_lock = threading.Lock()
+active_server_ids = []  # ids of the servers in active_servers, sampled by the power-of-two-choices policy
+write_buffers = {}  # socket -> deque of memoryview chunks of output the kernel has not accepted yet
+client_buffers = {}  # client socket -> preallocated memoryview its requests are received into
+client_buffer_fill = {}  # client socket -> bytes in its buffer, starting with the request being served
+client_timers = []  # min-heap of (monotonic deadline, timer id, client_conn, client_addr) for waiting clients
+# client socket -> id of its live timer, present exactly while the client is registered for reading;
+# timers with any other id are skipped lazily
+client_timer_ids = {}
+timer_ids = itertools.count()
+sel = selectors.DefaultSelector()
+log = logging.getLogger("lb")
 DEBUG_MODE = False
+QUIET_MODE = False
+PO2C_MODE = False
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queues the record itself and leaves formatting it to the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+
+def start_logging():
+    """Sends log records through a queue to a background thread, so the event loop never writes to stdout."""
+    log_queue = queue.SimpleQueue()
+    stdout_handler = logging.StreamHandler(sys.stdout)
+    stdout_handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(DeferredQueueHandler(log_queue))
+    log.setLevel(logging.DEBUG if DEBUG_MODE else logging.WARNING if QUIET_MODE else logging.INFO)
+    log.propagate = False
+    listener = QueueListener(log_queue, stdout_handler)
+    listener.start()
+    return listener
+
+
+def parse_request(request):
+    """Returns the raw request's type byte and base duration (a single digit), or None if it is malformed."""
+    if not KNOWN_REQUEST_TYPES[request[0]] or not 0x30 <= request[1] <= 0x39:
+        return None
+    return request[0], request[1] - 0x30
+
+
+def set_server_finish_time(server_id, finish_time):
+    server_finish_times[server_id] = finish_time
+    if not PO2C_MODE:
+        server_versions[server_id] += 1
+        heapq.heappush(server_type_heaps[SERVER_TYPE_OF[server_id]], (finish_time, server_versions[server_id], server_id))
+
+
+def pick_server(request_type, base_duration, current_time):
+    """Returns the server expected to finish the request first, that finish time and its processing time.
+
+    Every server of a type takes the same time for a request, so only the earliest-free server of each
+    type (the top of its heap) can win.
+    """
+    best_server_id = None
+    earliest_finish_time = float('inf')
+    best_processing_time = 0
 
+    for server_type_id, heap in enumerate(server_type_heaps):
+        while heap and heap[0][1] != server_versions[heap[0][2]]:
+            heapq.heappop(heap)
+        if not heap:
+            continue
 
-def debug_print(*args, **kwargs):
-    if DEBUG_MODE:
-        print(*args, **kwargs)
+        free_time, _, server_id = heap[0]
+        start_time = max(current_time, free_time)
+        processing_time = MULTIPLIERS_BY_BYTE[server_type_id][request_type] * base_duration
+        finish_time = start_time + processing_time
 
+        if finish_time < earliest_finish_time:
+            earliest_finish_time = finish_time
+            best_server_id = server_id
+            best_processing_time = processing_time
 
-def get_estimated_processing_time(server_type, request):
-    request_type = request[0]
-    base_duration = int(request[1])
-    multiplier = TIME_MULTIPLIERS.get((server_type, request_type), 1)
-    return base_duration * multiplier
+    return best_server_id, earliest_finish_time, best_processing_time
 
 
-def handle_client(client_conn, client_addr):
-    """This function runs in a dedicated thread for each connected client."""
-    debug_print("Accepted connection from client {}, starting new thread.".format(client_addr))
+def pick_server_po2c(request_type, base_duration, current_time):
+    """Like pick_server, but only compares two randomly sampled servers (power of two choices)."""
+    # Two distinct indexes without the list building and argument checks of random.sample().
+    count = len(active_server_ids)
+    if count > 1:
+        first = random.randrange(count)
+        second = random.randrange(count - 1)
+        if second >= first:
+            second += 1
+        candidates = (active_server_ids[first], active_server_ids[second])
+    else:
+        candidates = active_server_ids
+
+    best_server_id = None
+    earliest_finish_time = float('inf')
+    best_processing_time = 0
+
+    for server_id in candidates:
+        start_time = max(current_time, server_finish_times[server_id])
+        processing_time = MULTIPLIERS_BY_BYTE[SERVER_TYPE_OF[server_id]][request_type] * base_duration
+        finish_time = start_time + processing_time
+
+        if finish_time < earliest_finish_time:
+            earliest_finish_time = finish_time
+            best_server_id = server_id
+            best_processing_time = processing_time
+
+    return best_server_id, earliest_finish_time, best_processing_time
+
+
+def assign_request(server_id, finish_time, predicted_duration):
+    server_jobs[server_id].append(predicted_duration)
+    server_pending_work[server_id] += predicted_duration
+    set_server_finish_time(server_id, finish_time)
+
+
+def complete_request(server_id):
+    """Re-anchors the server's projected finish time on an actual completion (Least-Loaded-Updated).
+
+    A server answers its requests in the order they were sent, so the response is for the oldest job in its
+    queue. The server starts on the remaining jobs now, so a response that arrives earlier or later than
+    predicted corrects the estimate instead of letting the error pile up.
+    """
+    server_pending_work[server_id] -= server_jobs[server_id].popleft()
+    set_server_finish_time(server_id, time.time() + server_pending_work[server_id])
+
+
+def send_buffered(sock, data):
+    """Sends what the socket accepts right now and buffers the rest; returns True if nothing is left over."""
+    pending = write_buffers.get(sock)
+    if pending is not None:
+        pending.append(memoryview(bytes(data)))
+        return False
     try:
-        request = client_conn.recv(BUFFER_SIZE)
-        if not request:
-            return
+        sent = sock.send(data)
+    except BlockingIOError:
+        sent = 0
+    if sent == len(data):
+        return True
+    write_buffers[sock] = deque([memoryview(bytes(data[sent:]))])
+    return False
 
-        request_str = request.decode().strip()
-
-        best_server_name = None
-        chosen_server_ip = None
-        chosen_server_socket = None
-
-        with state_lock:
-            if not active_servers:
-                print("No active servers available. Dropping request.")
-                return
-
-            earliest_finish_time = float('inf')
-            current_time = time.time()
-
-            for name, config in active_servers.items():
-                start_time = max(current_time, server_finish_times.get(name, 0))
-                processing_time = get_estimated_processing_time(config['type'], request_str)
-                finish_time = start_time + processing_time
-
-                if finish_time < earliest_finish_time:
-                    earliest_finish_time = finish_time
-                    best_server_name = name
-                    chosen_server_ip = config['host']
-
-            if best_server_name:
-                server_finish_times[best_server_name] = earliest_finish_time
-                chosen_server_socket = server_sockets.get(best_server_name)
-
-        if chosen_server_socket and best_server_name:
-            print("received request {} from {} sending to {}-----".format(request_str, client_addr[0], chosen_server_ip))
-
-            try:
-                chosen_server_socket.sendall(request)
-                response = chosen_server_socket.recv(BUFFER_SIZE)
-                client_conn.sendall(response)
-                debug_print("Successfully relayed response for request '{}' to client {}".format(request_str, client_addr))
-
-            except socket.error as e:
-                print("Error communicating with server {}: {}. Removing from pool.".format(best_server_name, e))
-                with state_lock:
-                    if best_server_name in active_servers:
-                        del active_servers[best_server_name]
-                        server_sockets[best_server_name].close()
-                        del server_sockets[best_server_name]
+
+def flush_write_buffer(sock):
+    """Called on EVENT_WRITE; returns True once the socket's buffered output has been fully sent.
+
+    All queued chunks go out in one vectored sendmsg() call instead of one send() per chunk.
+    """
+    pending = write_buffers[sock]
+    try:
+        sent = sock.sendmsg(itertools.islice(pending, SENDMSG_MAX_CHUNKS))
+    except BlockingIOError:
+        return False
+    while sent:
+        if sent >= len(pending[0]):
+            sent -= len(pending.popleft())
         else:
-            print("Could not find a suitable server for request '{}'.".format(request_str))
+            pending[0] = pending[0][sent:]
+            sent = 0
+    if pending:
+        return False
+    del write_buffers[sock]
+    return True
+
+
+def close_client(client_conn, client_addr):
+    write_buffers.pop(client_conn, None)
+    client_buffers.pop(client_conn, None)
+    client_buffer_fill.pop(client_conn, None)
+    client_timer_ids.pop(client_conn, None)
+    client_conn.close()
+    log.debug("Closed connection for client %s.", client_addr)
+
+
+def await_next_request(client_conn, client_addr):
+    """Keeps the client connection open and waits up to CLIENT_IDLE_TIMEOUT for it to send another request."""
+    sel.register(client_conn, selectors.EVENT_READ, functools.partial(handle_client, client_addr=client_addr))
+    timer_id = next(timer_ids)
+    client_timer_ids[client_conn] = timer_id
+    heapq.heappush(client_timers, (time.monotonic() + CLIENT_IDLE_TIMEOUT, timer_id, client_conn, client_addr))
+
+
+def expire_idle_clients():
+    """Closes clients whose idle timer has run out; returns the seconds until the next deadline, or None.
+
+    Only expired or cancelled timers are popped, so the cost is independent of the number of idle clients.
+    Deadlines are on the monotonic clock, so a wall-clock step cannot expire every client at once or none.
+    """
+    now = time.monotonic()
+    while client_timers:
+        deadline, timer_id, client_conn, client_addr = client_timers[0]
+        if client_timer_ids.get(client_conn) != timer_id:
+            heapq.heappop(client_timers)
+        elif deadline > now:
+            return deadline - now
+        else:
+            heapq.heappop(client_timers)
+            log.debug("Closing idle connection for client %s.", client_addr)
+            sel.unregister(client_conn)
+            close_client(client_conn, client_addr)
+    return None
+
+
+def set_socket_buffers(sock):
+    # Set before connect()/listen() so the larger window is advertised in the handshake.
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
 
+
+def connect_to_server(server_name):
+    config = SERVERS[server_name]
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    set_socket_buffers(sock)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    try:
+        sock.connect((config['host'], config['port']))
+    except socket.error:
+        sock.close()
+        raise
+    sock.setblocking(False)
+    server_sockets[server_name] = sock
+    server_buffers[server_name] = memoryview(bytearray(BUFFER_SIZE))
+    server_buffer_fill[server_name] = 0
+    pending_clients[server_name] = deque()
+    sel.register(sock, selectors.EVENT_READ, functools.partial(handle_server_response, server_name=server_name))
+
+
+def remove_server(server_name, error):
+    log.error("Error communicating with server %s: %s. Removing from pool.", server_name, error)
+    if server_name in active_servers:
+        del active_servers[server_name]
+        server_versions[SERVERS[server_name]['id']] = -1
+        active_server_ids.remove(SERVERS[server_name]['id'])
+        sel.unregister(server_sockets[server_name])
+        write_buffers.pop(server_sockets[server_name], None)
+        server_sockets.pop(server_name).close()
+        del server_buffers[server_name]
+        del server_buffer_fill[server_name]
+        for client_conn, client_addr in pending_clients.pop(server_name):
+            close_client(client_conn, client_addr)
+
+
+def accept_client(listening_socket, mask):
+    # Drain the whole accept queue per wakeup. With TCP_DEFER_ACCEPT the request has usually
+    # arrived along with the connection, so it is read right away instead of on a later wakeup.
+    while True:
+        try:
+            client_conn, client_addr = listening_socket.accept()
+        except BlockingIOError:
+            return
+        client_conn.setblocking(False)
+        client_buffers[client_conn] = memoryview(bytearray(BUFFER_SIZE))
+        client_buffer_fill[client_conn] = 0
+        client_conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client_conn.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        client_conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, CLIENT_KEEPIDLE)
+        log.debug("Accepted connection from client %s.", client_addr)
+        # Not registered yet: handle_client only registers it and arms its idle timer if the read would block.
+        handle_client(client_conn, selectors.EVENT_READ, client_addr)
+
+
+def handle_client(client_conn, mask, client_addr):
+    """Called by the event loop when a client's request is ready to be read."""
+    buffer = client_buffers[client_conn]
+    filled = client_buffer_fill[client_conn]
+    try:
+        received = client_conn.recv_into(buffer[filled:])
+    except BlockingIOError:
+        if client_conn not in client_timer_ids:
+            await_next_request(client_conn, client_addr)
+        return
     except socket.error as e:
-        print("Socket error with client {}: {}".format(client_addr, e))
-    finally:
-        client_conn.close()
-        debug_print("Closed connection and thread for client {}.".format(client_addr))
+        log.warning("Socket error with client %s: %s", client_addr, e)
+        if client_conn in client_timer_ids:
+            sel.unregister(client_conn)
+        close_client(client_conn, client_addr)
+        return
+
+    if not received:
+        if client_conn in client_timer_ids:
+            sel.unregister(client_conn)
+        close_client(client_conn, client_addr)
+        return
+    # The kernel falls back to delayed ACKs after a while, so quick ACK mode is re-armed after every read.
+    client_conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+
+    filled += received
+    client_buffer_fill[client_conn] = filled
+    if filled < REQUEST_SIZE:
+        # Only part of the request has arrived; keep it and wait for the rest.
+        if client_conn not in client_timer_ids:
+            await_next_request(client_conn, client_addr)
+        return
+
+    # Stop reading until this request is answered. Requests pipelined behind it wait in the buffer or the kernel.
+    if client_timer_ids.pop(client_conn, None) is not None:
+        sel.unregister(client_conn)
+    dispatch_request(client_conn, client_addr)
+
+
+def dispatch_request(client_conn, client_addr):
+    """Schedules the complete request at the start of the client's buffer and queues it for its server."""
+    # The request stays at the start of the buffer until it is answered, so a view of it is what gets
+    # forwarded. Only the request itself is sent, so the server's reads stay aligned with the pipelined
+    # requests and every answer is REQUEST_SIZE bytes.
+    request = client_buffers[client_conn][:REQUEST_SIZE]
+    parsed_request = parse_request(request)
+    if not parsed_request:
+        log.warning("Malformed request '%s' from client %s. Dropping request.", str(request, 'utf-8', 'replace'),
+                    client_addr)
+        close_client(client_conn, client_addr)
+        return
+
+    if not active_servers:
+        log.warning("No active servers available. Dropping request.")
+        close_client(client_conn, client_addr)
+        return
+
+    if PO2C_MODE:
+        best_server_id, earliest_finish_time, processing_time = pick_server_po2c(*parsed_request, time.time())
+    else:
+        best_server_id, earliest_finish_time, processing_time = pick_server(*parsed_request, time.time())
+    assign_request(best_server_id, earliest_finish_time, processing_time)
+    best_server_name = SERVER_NAMES[best_server_id]
+    # The request is only decoded for the log line, and only when INFO records are kept.
+    if log.isEnabledFor(logging.INFO):
+        log.info("received request %s from %s sending to %s-----", str(request, 'utf-8', 'replace'), client_addr[0],
+                 SERVERS[best_server_name]['host'])
+
+    # Responses from a server arrive in the order its requests were sent.
+    outgoing_requests.setdefault(best_server_name, []).append(request)
+    pending_clients[best_server_name].append((client_conn, client_addr))
+
+
+def finish_request(client_conn, client_addr):
+    """Drops the answered request from the client's buffer and serves the next one, or waits for it."""
+    buffer = client_buffers[client_conn]
+    filled = client_buffer_fill[client_conn] - REQUEST_SIZE
+    buffer[:filled] = buffer[REQUEST_SIZE:REQUEST_SIZE + filled]
+    client_buffer_fill[client_conn] = filled
+    if filled >= REQUEST_SIZE:
+        dispatch_request(client_conn, client_addr)
+    else:
+        await_next_request(client_conn, client_addr)
+
+
+def handle_server_response(server_sock, mask, server_name):
+    """Called by the event loop when a backend server has sent responses or can take buffered requests."""
+    if mask & selectors.EVENT_WRITE:
+        try:
+            if flush_write_buffer(server_sock):
+                sel.modify(server_sock, selectors.EVENT_READ, sel.get_key(server_sock).data)
+        except socket.error as e:
+            remove_server(server_name, e)
+            return
+
+    if not mask & selectors.EVENT_READ:
+        return
+
+    buffer = server_buffers[server_name]
+    filled = server_buffer_fill[server_name]
+    try:
+        received = server_sock.recv_into(buffer[filled:])
+        if not received:
+            raise socket.error("connection closed by server")
+    except BlockingIOError:
+        return
+    except socket.error as e:
+        remove_server(server_name, e)
+        return
+
+    # One read can hold several pipelined responses, or only part of one; split it on REQUEST_SIZE
+    # boundaries and keep any incomplete tail for the next read.
+    filled += received
+    complete = filled - filled % REQUEST_SIZE
+    pending = pending_clients[server_name]
+    server_id = SERVERS[server_name]['id']
+    for offset in range(0, complete, REQUEST_SIZE):
+        if not pending:
+            log.debug("Discarding unexpected data from server %s.", server_name)
+            break
+        client_conn, client_addr = pending.popleft()
+        complete_request(server_id)
+        relay_response(client_conn, client_addr, buffer[offset:offset + REQUEST_SIZE])
+    buffer[:filled - complete] = buffer[complete:filled]
+    server_buffer_fill[server_name] = filled - complete
+
+
+def send_outgoing_requests():
+    """Sends the requests dispatched during this round of events, one vectored sendmsg() per server.
+
+    The requests are views into their clients' receive buffers. Those clients are not read from again until
+    they are answered, so the views stay valid until the server has been sent the request.
+    """
+    for server_name, requests in outgoing_requests.items():
+        if server_name not in server_sockets:
+            # Removed later in the same round; its pending clients are already closed.
+            continue
+        sock = server_sockets[server_name]
+        pending = write_buffers.get(sock)
+        if pending is not None:
+            # Already waiting for EVENT_WRITE, which sends these after the earlier output.
+            pending.extend(requests)
+            continue
+        write_buffers[sock] = deque(requests)
+        try:
+            if not flush_write_buffer(sock):
+                sel.modify(sock, selectors.EVENT_READ | selectors.EVENT_WRITE, sel.get_key(sock).data)
+        except socket.error as e:
+            remove_server(server_name, e)
+    outgoing_requests.clear()
+
+
+def relay_response(client_conn, client_addr, response):
+    try:
+        # send_buffered copies whatever it cannot send now, so the buffer is free for the next recv_into.
+        if not send_buffered(client_conn, response):
+            sel.register(client_conn, selectors.EVENT_WRITE, functools.partial(flush_client, client_addr=client_addr))
+            return
+        if log.isEnabledFor(logging.DEBUG):
+            # The response echoes its request.
+            log.debug("Successfully relayed response for request '%s' to client %s", str(response, 'utf-8', 'replace'),
+                      client_addr)
+    except socket.error as e:
+        log.warning("Socket error with client %s: %s", client_addr, e)
+        close_client(client_conn, client_addr)
+        return
+    finish_request(client_conn, client_addr)
+
+
+def flush_client(client_conn, mask, client_addr):
+    """Called by the event loop when a slow client can take more of its buffered response."""
+    try:
+        if not flush_write_buffer(client_conn):
+            return
+        log.debug("Successfully relayed response to client %s", client_addr)
+    except socket.error as e:
+        log.warning("Socket error with client %s: %s", client_addr, e)
+        sel.unregister(client_conn)
+        close_client(client_conn, client_addr)
+        return
+    sel.unregister(client_conn)
+    finish_request(client_conn, client_addr)
 
 
 def main():
-    global DEBUG_MODE
-    if "-debug" in sys.argv:
-        DEBUG_MODE = True
-        debug_print("--- Debug mode enabled ---")
+    global DEBUG_MODE, QUIET_MODE, PO2C_MODE
+    DEBUG_MODE = "-debug" in sys.argv
+    QUIET_MODE = "-quiet" in sys.argv
+    PO2C_MODE = "-po2c" in sys.argv
+    log_listener = start_logging()
+    log.debug("--- Debug mode enabled ---")
+    if PO2C_MODE:
+        log.debug("--- Power-of-two-choices scheduling enabled ---")
 
-    print("Connecting to servers-----")
+    log.info("Connecting to servers-----")
 
-    for name, config in SERVERS.items():
+    for name in SERVERS:
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect((config['host'], config['port']))
-            server_sockets[name] = sock
-            server_finish_times[name] = time.time()
-            debug_print("Successfully connected to server {}.".format(name))
+            connect_to_server(name)
+            set_server_finish_time(SERVERS[name]['id'], time.time())
+            active_server_ids.append(SERVERS[name]['id'])
+            log.debug("Successfully connected to server %s.", name)
         except socket.error as e:
-            print("Error: Could not connect to server {}. Removing from active pool.".format(name, e))
+            log.error("Error: Could not connect to server %s: %s. Removing from active pool.", name, e)
             if name in active_servers:
                 del active_servers[name]
 
     if not active_servers:
-        print("Fatal: Could not connect to any backend servers. Exiting.")
+        log.critical("Fatal: Could not connect to any backend servers. Exiting.")
+        log_listener.stop()
         return
 
     listening_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     listening_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listening_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_DEFER_ACCEPT, 1)
+    set_socket_buffers(listening_socket)
     listening_socket.bind((LISTENING_HOST, LISTENING_PORT))
-    listening_socket.listen(10)
-    debug_print("Load Balancer is listening on {}:{}".format(LISTENING_HOST, LISTENING_PORT))
+    listening_socket.listen(LISTEN_BACKLOG)
+    listening_socket.setblocking(False)
+    sel.register(listening_socket, selectors.EVENT_READ, accept_client)
+    log.debug("Load Balancer is listening on %s:%s", LISTENING_HOST, LISTENING_PORT)
 
     try:
         while True:
-            client_conn, client_addr = listening_socket.accept()
-            thread = threading.Thread(target=handle_client, args=(client_conn, client_addr))
-            thread.daemon = True
-            thread.start()
+            for key, mask in sel.select(timeout=expire_idle_clients()):
+                # One bad event must not take the balancer down for every other client.
+                try:
+                    key.data(key.fileobj, mask)
+                except Exception:
+                    log.exception("Unexpected error while handling %s", key.fileobj)
+            send_outgoing_requests()
     except KeyboardInterrupt:
-        debug_print("\n--- Shutting down Load Balancer ---")
+        log.debug("\n--- Shutting down Load Balancer ---")
     finally:
+        sel.close()
         listening_socket.close()
         for sock in server_sockets.values():
             sock.close()
-        debug_print("All sockets closed.")
+        log.debug("All sockets closed.")
+        log_listener.stop()
 
 
 if __name__ == "__main__":